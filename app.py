@@ -1,31 +1,135 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import re
-from datetime import datetime
-from typing import List
-from genai import GenAI
-from utils import (
-    analyze_twitter_data,
-    generate_mbti_radar_chart,
-    create_travel_plan,
-    generate_daily_itinerary,
-    optimize_route,
-    get_accommodation_options,
-    get_restaurant_options,
-    get_attraction_options,
-    get_hidden_spots,
-    get_transportation_options
-)
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from genai import GenAI, FALLBACK_TEXT, MBTI_TYPES
+
+# pandas, numpy and plotly (via utils) are imported where they are used, so pages that
+# never touch them do not pay their import cost on a cold start
+
+# Build the client once per process so its HTTP connection pool is reused across reruns and sessions
+@st.cache_resource(show_spinner=False)
+def get_genai():
+    # Load environment variables
+    load_dotenv()
+    return GenAI(os.getenv("OPENAI_API_KEY"))
+
+
+genai = get_genai()
+
+MOTIVATION_PROMPT = "Write a short motivational paragraph (maximum 3 sentences) explaining why creating a travel plan based on MBTI personality type is important and enhances travel experiences."
+MOTIVATION_INSTRUCTIONS = "You are a travel inspiration writer. Make it motivational, focused on MBTI personalization benefits."
+WARM_RETRY_SECONDS = 5 * 60
+INSPIRATION_IMAGE_PROMPT = "a breathtaking travel destination, dreamy, colorful, relaxing vibes, photorealistic, no text"
+
+ACCOM_TYPES = ("Any", "Hotel", "Hostel", "Apartment", "Resort", "Boutique Hotel", "Bed & Breakfast")
+ACCOM_IDX = {name: i for i, name in enumerate(ACCOM_TYPES)}
+BUDGET_OPTIONS = {
+    "Budget": "$",
+    "Moderate": "$$",
+    "Luxury": "$$$",
+    "Ultra-Luxury": "$$$$"
+}
+BUDGET_KEYS = tuple(BUDGET_OPTIONS.keys())
+TRAVEL_STYLES = ("Adventure", "Relaxation", "Cultural", "Foodie", "Nature", "Shopping", "Nightlife", "Historical", "Family-friendly")
+
+
+class _Uncached(Exception):
+    # Carries a result out of a cached function without it being cached
+    def __init__(self, value):
+        super().__init__("generation failed")
+        self.value = value
+
+
+# Cache LLM output across reruns so repeated prompts skip the network round-trip. A failed
+# request comes back as FALLBACK_TEXT; raising keeps it out of the cache so a later rerun retries.
+@st.cache_data(ttl=24 * 60 * 60, show_spinner=False)
+def _generated_text(prompt, instructions, temperature):
+    # The prompts cached here are constants, so exact matches suffice and no embeddings are needed
+    text = genai.generate_text(prompt, instructions=instructions, temperature=temperature, semantic_cache=True, semantic_exact_only=True)
+    if text == FALLBACK_TEXT:
+        raise _Uncached(text)
+    return text
+
+
+@st.cache_data(ttl=24 * 60 * 60, show_spinner=False)
+def _generated_bundle(mbti):
+    bundle = genai.generate_bundle(mbti, semantic_cache=True)
+    if FALLBACK_TEXT in bundle.values():
+        raise _Uncached(bundle)
+    return bundle
+
+
+def _cached_text(prompt, instructions='You are a helpful AI travel assistant', temperature=1):
+    try:
+        return _generated_text(prompt, instructions, temperature)
+    except _Uncached as e:
+        return e.value
+
+
+def _cached_bundle(mbti):
+    try:
+        return _generated_bundle(mbti)
+    except _Uncached as e:
+        return e.value
+
+
+# One worker pool per process for background calls, instead of a new pool on every rerun
+@st.cache_resource(show_spinner=False)
+def _executor():
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def _submit(fn, *args, **kwargs):
+    # The workers are shared by all sessions, so each job carries the submitting script's context
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+
+    return _executor().submit(run)
+
+
+@st.cache_data(show_spinner=False)
+def _radar(scores_tuple):
+    from utils import generate_mbti_radar_chart
+    return generate_mbti_radar_chart(dict(scores_tuple))
+
 
-# Load environment variables
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-genai = GenAI(openai_api_key)
+@st.cache_data(show_spinner=False)
+def _css():
+    with open(os.path.join(os.path.dirname(__file__), "assets", "style.css"), encoding="utf-8") as f:
+        return f.read()
+
+
+# Collect every problem with the submitted preferences so they can be shown together
+def validate_prefs(country, city, start_date, end_date):
+    errors = []
+    if not country or not city:
+        errors.append("Please enter both country and city.")
+    if not start_date or not end_date:
+        errors.append("Please select both start and end dates.")
+    elif start_date >= end_date:
+        errors.append("End date must be after start date.")
+    return errors
+
+
+# The inspirational image never changes, so generate it once per process. The bytes are kept
+# rather than the URL, which expires after an hour; failures raise so they are not cached.
+@st.cache_resource(show_spinner=False)
+def _inspirational_image():
+    import requests
+
+    url = genai.generate_image(INSPIRATION_IMAGE_PROMPT)
+    if not url:
+        raise RuntimeError("Could not generate the inspirational image")
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.content
 
 # Configure page settings
 st.set_page_config(
@@ -35,98 +139,39 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for styling
-st.markdown("""
-<style>
-:root {
-    --primary-color: #4361ee;
-    --secondary-color: #3f37c9;
-    --accent-color: #f72585;
-    --background-color: #f8f9fa;
-    --text-color: #212529;
-}
 
-body {
-    cursor: url("data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='32' height='32' viewBox='0 0 24 24' fill='none' stroke='%234361ee' stroke-width='1.5' stroke-linecap='round' stroke-linejoin='round'%3E%3Cpath d='M17.8 19.2L16 11l3.5-3.5C21 6 21.5 4 21 3c-1-.5-3 0-4.5 1.5L13 8 4.8 6.2c-.5-.1-.9.1-1.1.5l-.3.5c-.2.5-.1 1 .3 1.3L9 12l-2 3H4l-1 1 5 2 2 5 1-1v-3l3-2 3.5 5.3c.3.4.8.5 1.3.3l.5-.2c.4-.3.6-.7.5-1.2z'%3E%3C/path%3E%3C/svg%3E"), auto;
-}
+# Pre-generate the home page texts in a background thread once per process, so the first
+# visitor is not kept waiting; the semantic cache persists them on disk. A warm-up that left
+# texts uncached is retried on a later rerun, at most every WARM_RETRY_SECONDS.
+@st.cache_resource(show_spinner=False)
+def _warm_state():
+    return {"lock": threading.Lock(), "thread": None, "started": 0.0, "done": False}
 
-.stApp {
-    background-color: var(--background-color);
-    color: var(--text-color);
-}
 
-.stButton>button {
-    background-color: var(--primary-color);
-    color: white;
-    border-radius: 10px;
-    padding: 0.5rem 1rem;
-    transition: all 0.3s;
-    cursor: url("data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='32' height='32' viewBox='0 0 24 24' fill='none' stroke='%23f72585' stroke-width='1.5' stroke-linecap='round' stroke-linejoin='round'%3E%3Cpath d='M17.8 19.2L16 11l3.5-3.5C21 6 21.5 4 21 3c-1-.5-3 0-4.5 1.5L13 8 4.8 6.2c-.5-.1-.9.1-1.1.5l-.3.5c-.2.5-.1 1 .3 1.3L9 12l-2 3H4l-1 1 5 2 2 5 1-1v-3l3-2 3.5 5.3c.3.4.8.5 1.3.3l.5-.2c.4-.3.6-.7.5-1.2z'%3E%3C/path%3E%3C/svg%3E"), pointer;
-}
+def _warm_mbti_texts(state):
+    try:
+        cached = genai.warm_bundles(MBTI_TYPES)
+        cached += genai.warm_semantic_cache([MOTIVATION_PROMPT], instructions=MOTIVATION_INSTRUCTIONS, temperature=0.7, embed=False)
+        state["done"] = cached == len(MBTI_TYPES) + 1
+    except Exception as e:
+        print(f"Error warming MBTI texts: {str(e)}")
 
-.stButton>button:hover {
-    background-color: var(--secondary-color);
-    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-    transform: translateY(-2px);
-}
-
-h1, h2, h3 {
-    color: var(--primary-color);
-}
-
-.highlight-card {
-    border: 1px solid #e9ecef;
-    border-radius: 10px;
-    padding: 1.5rem;
-    margin-bottom: 1rem;
-    background-color: white;
-    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.05);
-    transition: all 0.3s;
-}
 
-.highlight-card:hover {
-    box-shadow: 0 10px 15px rgba(0, 0, 0, 0.1);
-    transform: translateY(-5px);
-}
+def warm_mbti():
+    state = _warm_state()
+    with state["lock"]:
+        thread = state["thread"]
+        if state["done"] or thread is not None and (thread.is_alive() or time.time() - state["started"] < WARM_RETRY_SECONDS):
+            return
+        state["started"] = time.time()
+        state["thread"] = threading.Thread(target=_warm_mbti_texts, args=(state,), daemon=True)
+        state["thread"].start()
 
-.travel-option {
-    border: 2px solid #e9ecef;
-    border-radius: 10px;
-    padding: 1rem;
-    margin: 0.5rem 0;
-    cursor: url("data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='32' height='32' viewBox='0 0 24 24' fill='none' stroke='%233f37c9' stroke-width='1.5' stroke-linecap='round' stroke-linejoin='round'%3E%3Cpath d='M17.8 19.2L16 11l3.5-3.5C21 6 21.5 4 21 3c-1-.5-3 0-4.5 1.5L13 8 4.8 6.2c-.5-.1-.9.1-1.1.5l-.3.5c-.2.5-.1 1 .3 1.3L9 12l-2 3H4l-1 1 5 2 2 5 1-1v-3l3-2 3.5 5.3c.3.4.8.5 1.3.3l.5-.2c.4-.3.6-.7.5-1.2z'%3E%3C/path%3E%3C/svg%3E"), pointer;
-    transition: all 0.2s;
-}
 
-.travel-option:hover {
-    border-color: var(--accent-color);
-    background-color: #f8f9fa;
-}
-
-.travel-option.selected {
-    border-color: var(--primary-color);
-    background-color: rgba(67, 97, 238, 0.1);
-}
+warm_mbti()
 
-.drag-item {
-    padding: 10px;
-    border: 1px solid #ddd;
-    border-radius: 5px;
-    margin-bottom: 5px;
-    background-color: white;
-    cursor: url("data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='32' height='32' viewBox='0 0 24 24' fill='none' stroke='%234361ee' stroke-width='1.5' stroke-linecap='round' stroke-linejoin='round'%3E%3Cpath d='M17.8 19.2L16 11l3.5-3.5C21 6 21.5 4 21 3c-1-.5-3 0-4.5 1.5L13 8 4.8 6.2c-.5-.1-.9.1-1.1.5l-.3.5c-.2.5-.1 1 .3 1.3L9 12l-2 3H4l-1 1 5 2 2 5 1-1v-3l3-2 3.5 5.3c.3.4.8.5 1.3.3l.5-.2c.4-.3.6-.7.5-1.2z'%3E%3C/path%3E%3C/svg%3E"), grab;
-}
-
-/* Additional cursor styles for other interactive elements */
-.stSelectbox__control, 
-.stMultiSelect__control, 
-.stTextInput__input, 
-.stDateInput__input,
-.stFileUploader {
-    cursor: url("data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='32' height='32' viewBox='0 0 24 24' fill='none' stroke='%23f72585' stroke-width='1.5' stroke-linecap='round' stroke-linejoin='round'%3E%3Cpath d='M17.8 19.2L16 11l3.5-3.5C21 6 21.5 4 21 3c-1-.5-3 0-4.5 1.5L13 8 4.8 6.2c-.5-.1-.9.1-1.1.5l-.3.5c-.2.5-.1 1 .3 1.3L9 12l-2 3H4l-1 1 5 2 2 5 1-1v-3l3-2 3.5 5.3c.3.4.8.5 1.3.3l.5-.2c.4-.3.6-.7.5-1.2z'%3E%3C/path%3E%3C/svg%3E"), text;
-}
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for styling
+st.markdown(f"<style>{_css()}</style>", unsafe_allow_html=True)
 
 # App Header
 st.markdown("""
@@ -149,6 +194,8 @@ if 'travel_preferences' not in st.session_state:
     st.session_state.travel_preferences = {}
 if 'travel_plan' not in st.session_state:
     st.session_state.travel_plan = None
+if 'travel_plan_key' not in st.session_state:
+    st.session_state.travel_plan_key = None
 if 'daily_itineraries' not in st.session_state:
     st.session_state.daily_itineraries = []
 
@@ -161,10 +208,13 @@ pages = [
     "Download Travel Plan"
 ]
 
-# Navigation buttons in sidebar
-for i, page_name in enumerate(pages):
-    if st.sidebar.button(page_name, key=f"nav_{i}"):
-        st.session_state.page = i
+# Navigation radio in sidebar, kept in sync with page changes made by the in-page buttons
+def _on_nav_change():
+    st.session_state.page = pages.index(st.session_state.nav_radio)
+
+
+st.session_state.nav_radio = pages[st.session_state.page]
+st.sidebar.radio("Navigation", pages, key="nav_radio", on_change=_on_nav_change, label_visibility="collapsed")
 
 # Display current progress
 st.sidebar.progress((st.session_state.page) / (len(pages) - 1))
@@ -173,6 +223,13 @@ st.sidebar.progress((st.session_state.page) / (len(pages) - 1))
 if st.session_state.page == 0:
     # Divide the entire page into two columns: 2/3 for functions, 1/3 for image and inspiration
     left_col, right_col = st.columns([2, 1])
+    # MBTI description and motivational paragraph, fetched together once the type is known
+    bundle = None
+
+    # Start the right column's calls now so they run alongside each other and the analysis on the
+    # left; the motivation text comes with the bundle when there is one, but that is not known yet
+    image_future = _submit(_inspirational_image)
+    motivation_future = _submit(_cached_text, MOTIVATION_PROMPT, instructions=MOTIVATION_INSTRUCTIONS, temperature=0.7)
 
     # Left side: Title and App Functions
     with left_col:
@@ -183,19 +240,43 @@ if st.session_state.page == 0:
         uploaded_file = st.file_uploader("Upload CSV file containing tweets", type=['csv'])
 
         if uploaded_file is not None:
+            import numpy as np
+            import pandas as pd
+            from utils import analyze_twitter_data
+
             try:
-                df = pd.read_csv(uploaded_file)
                 required_columns = ['text', 'favorite_count', 'view_count']
-                missing_columns = [col for col in required_columns if col not in df.columns]
+                missing_columns = []
+                parts = []
+
+                # Read the export in chunks, keeping only the text and engagement of each valid row.
+                # Counts are parsed as float32 so blank cells can stay NaN at half the width of the default.
+                reader = pd.read_csv(
+                    uploaded_file,
+                    chunksize=50_000,
+                    usecols=lambda col: col in required_columns,
+                    dtype={'favorite_count': 'float32', 'view_count': 'float32'}
+                )
+                for chunk in reader:
+                    missing_columns = [col for col in required_columns if col not in chunk.columns]
+                    if missing_columns:
+                        break
+
+                    # Calculate engagement and clean data
+                    # (rows without views stay NaN instead of becoming inf, then get dropped)
+                    fav = chunk['favorite_count'].to_numpy()
+                    view = chunk['view_count'].to_numpy()
+                    eng = np.full(fav.shape, np.nan, dtype=np.float32)
+                    np.divide(fav, view, out=eng, where=view > 0)
+                    mask = ~np.isnan(eng)
+                    parts.append(chunk[['text']].iloc[mask].assign(engagement=eng[mask]))
 
                 if missing_columns:
                     st.error(f"Missing required columns: {', '.join(missing_columns)}")
                 else:
-                    with st.spinner("Analyzing your Twitter data..."):
-                        # Calculate engagement and clean data
-                        df['engagement'] = df['favorite_count'] / df['view_count']
-                        df = df.replace([np.inf, -np.inf], np.nan).dropna(subset=['engagement'])
+                    df = pd.concat(parts)
 
+                    with st.spinner("Analyzing your Twitter data..."):
                         # Save data to session state
                         st.session_state.twitter_data = df
 
@@ -203,6 +284,7 @@ if st.session_state.page == 0:
                         mbti, mbti_scores = analyze_twitter_data(df, genai)
                         st.session_state.mbti = mbti
                         st.session_state.mbti_scores = mbti_scores
+                        bundle = _cached_bundle(mbti)
 
                         # Show MBTI result and radar chart
                         col_a, col_b = st.columns([2, 3])
@@ -211,11 +293,11 @@ if st.session_state.page == 0:
                             <div class="highlight-card">
                                 <h2 style="text-align: center;">Your MBTI Type</h2>
                                 <h1 style="text-align: center; font-size: 3rem; color: var(--accent-color);">{mbti}</h1>
-                                <p style="text-align: center;">{genai.generate_text(f"Describe the {mbti} personality type in 1-2 sentences, focusing on travel preferences.")}</p>
+                                <p style="text-align: center;">{bundle['mbti_description']}</p>
                             </div>
                             """, unsafe_allow_html=True)
                         with col_b:
-                            fig = generate_mbti_radar_chart(mbti_scores)
+                            fig = _radar(tuple(sorted(mbti_scores.items())))
                             st.plotly_chart(fig, use_container_width=True)
 
                         # Navigation button
@@ -239,6 +321,7 @@ if st.session_state.page == 0:
                 }
                 st.session_state.mbti = sample_mbti
                 st.session_state.mbti_scores = sample_scores
+                bundle = _cached_bundle(sample_mbti)
 
                 # Show sample MBTI results
                 col_a, col_b = st.columns([2, 3])
@@ -247,11 +330,11 @@ if st.session_state.page == 0:
                     <div class="highlight-card">
                         <h2 style="text-align: center;">Your MBTI Type</h2>
                         <h1 style="text-align: center; font-size: 3rem; color: var(--accent-color);">{sample_mbti}</h1>
-                        <p style="text-align: center;">{genai.generate_text(f"Describe the {sample_mbti} personality type in 1-2 sentences, focusing on travel preferences.")}</p>
+                        <p style="text-align: center;">{bundle['mbti_description']}</p>
                     </div>
                     """, unsafe_allow_html=True)
                 with col_b:
-                    fig = generate_mbti_radar_chart(sample_scores)
+                    fig = _radar(tuple(sorted(sample_scores.items())))
                     st.plotly_chart(fig, use_container_width=True)
 
                 if st.button("Proceed to Travel Preferences", key="proceed_from_sample"):
@@ -263,20 +346,21 @@ if st.session_state.page == 0:
         with st.spinner("Generating inspirational content..."):
             try:
                 # Generate travel-related image
-                travel_image_url = genai.generate_image(
-                    "a breathtaking travel destination, dreamy, colorful, relaxing vibes, photorealistic, no text"
-                )
-                if travel_image_url:
-                    st.image(travel_image_url, caption="Imagine Your Dream Destination", use_container_width=True)
+                try:
+                    travel_image = image_future.result()
+                except Exception as e:
+                    print(f"Error loading travel image: {str(e)}")
+                    travel_image = None
+                if travel_image:
+                    st.image(travel_image, caption="Imagine Your Dream Destination", use_container_width=True)
                 else:
                     st.warning("Could not load travel image at the moment.")
 
-                # Generate motivational text about MBTI-based travel planning
-                importance_text = genai.generate_text(
-                    "Write a short motivational paragraph (maximum 3 sentences) explaining why creating a travel plan based on MBTI personality type is important and enhances travel experiences.",
-                    instructions="You are a travel inspiration writer. Make it motivational, focused on MBTI personalization benefits.",
-                    temperature=0.7
-                )
+                # Generate motivational text about MBTI-based travel planning, unless it came with the bundle
+                if bundle:
+                    importance_text = bundle['motivational_paragraph']
+                else:
+                    importance_text = motivation_future.result()
                 st.markdown(f"""
                 <div class="highlight-card" style="margin-top: 1rem;">
                     <h3 style="text-align: center;">✈️ Why Personality-based Travel Planning Matters</h3>
@@ -292,78 +376,67 @@ elif st.session_state.page == 1:
     st.header("Travel Preferences")
     st.markdown("Tell us about your dream trip so we can customize your perfect itinerary.")
     
-    col1, col2 = st.columns(2)
+    # Widgets inside the form only rerun the script when the form is submitted
+    with st.form("prefs_form"):
+        col1, col2 = st.columns(2)
     
-    with col1:
-        # Destination Card
-        with st.container():
-            st.subheader("Destination")
-            country = st.text_input("Country", value=st.session_state.travel_preferences.get('country', ''))
-            city = st.text_input("City", value=st.session_state.travel_preferences.get('city', ''))
+        with col1:
+            # Destination Card
+            with st.container():
+                st.subheader("Destination")
+                country = st.text_input("Country", value=st.session_state.travel_preferences.get('country', ''))
+                city = st.text_input("City", value=st.session_state.travel_preferences.get('city', ''))
         
-        # Travel Dates Card
-        with st.container():
-            st.subheader("Travel Dates")
-            col1a, col1b = st.columns(2)
-            with col1a:
-                start_date = st.date_input("Start Date", value=None)
-            with col1b:
-                end_date = st.date_input("End Date", value=None)
+            # Travel Dates Card
+            with st.container():
+                st.subheader("Travel Dates")
+                col1a, col1b = st.columns(2)
+                with col1a:
+                    start_date = st.date_input("Start Date", value=None)
+                with col1b:
+                    end_date = st.date_input("End Date", value=None)
     
-    with col2:
-        # Travel Details Card
-        with st.container():
-            st.subheader("Travel Details")
-            num_travelers = st.number_input("Number of Travelers", min_value=1, max_value=10, value=st.session_state.travel_preferences.get('num_travelers', 1))
-            
-            budget_options = {
-                "Budget": "$",
-                "Moderate": "$$",
-                "Luxury": "$$$",
-                "Ultra-Luxury": "$$$$"
-            }
-            budget = st.select_slider(
-                "Budget Range",
-                options=list(budget_options.keys()),
-                value=st.session_state.travel_preferences.get('budget', 'Moderate')
-            )
+        with col2:
+            # Travel Details Card
+            with st.container():
+                st.subheader("Travel Details")
+                num_travelers = st.number_input("Number of Travelers", min_value=1, max_value=10, value=st.session_state.travel_preferences.get('num_travelers', 1))
             
-            travel_style = st.multiselect(
-                "Travel Style (Select up to 3)",
-                ["Adventure", "Relaxation", "Cultural", "Foodie", "Nature", "Shopping", "Nightlife", "Historical", "Family-friendly"],
-                default=st.session_state.travel_preferences.get('travel_style', ["Cultural"])
-            )
+                budget = st.select_slider(
+                    "Budget Range",
+                    options=BUDGET_KEYS,
+                    value=st.session_state.travel_preferences.get('budget', 'Moderate')
+                )
             
-            # Limit selection to 3 options
-            if len(travel_style) > 3:
-                st.warning("Please select a maximum of 3 travel styles.")
-                travel_style = travel_style[:3]
+                travel_style = st.multiselect(
+                    "Travel Style (Select up to 3)",
+                    TRAVEL_STYLES,
+                    default=st.session_state.travel_preferences.get('travel_style', ["Cultural"]),
+                    max_selections=3
+                )
     
-    # Additional Preferences Card
-    with st.container():
-        st.subheader("Additional Preferences")
-        accommodation_type = st.selectbox(
-            "Preferred Accommodation Type",
-            ["Any", "Hotel", "Hostel", "Apartment", "Resort", "Boutique Hotel", "Bed & Breakfast"],
-            index=["Any", "Hotel", "Hostel", "Apartment", "Resort", "Boutique Hotel", "Bed & Breakfast"].index(st.session_state.travel_preferences.get('accommodation_type', 'Any'))
-        )
+        # Additional Preferences Card
+        with st.container():
+            st.subheader("Additional Preferences")
+            accommodation_type = st.selectbox(
+                "Preferred Accommodation Type",
+                ACCOM_TYPES,
+                index=ACCOM_IDX.get(st.session_state.travel_preferences.get('accommodation_type', 'Any'), 0)
+            )
         
-        col3, col4 = st.columns(2)
-        with col3:
-            must_see_attractions = st.text_area("Must-See Attractions (one per line)", value=st.session_state.travel_preferences.get('must_see_attractions', ''))
-        with col4:
-            food_preferences = st.text_area("Food Preferences or Restrictions", value=st.session_state.travel_preferences.get('food_preferences', ''))
+            col3, col4 = st.columns(2)
+            with col3:
+                must_see_attractions = st.text_area("Must-See Attractions (one per line)", value=st.session_state.travel_preferences.get('must_see_attractions', ''))
+            with col4:
+                food_preferences = st.text_area("Food Preferences or Restrictions", value=st.session_state.travel_preferences.get('food_preferences', ''))
     
-    # Save preferences
-    if st.button("Save Preferences and Generate Plan"):
-        if not country or not city:
-            st.error("Please enter both country and city.")
-        elif not start_date or not end_date:
-            st.error("Please select both start and end dates.")
-        elif start_date >= end_date:
-            st.error("End date must be after start date.")
-        elif len(travel_style) > 3:
-            st.error("Please select a maximum of 3 travel styles.")
+        # Save preferences
+        submitted = st.form_submit_button("Save Preferences and Generate Plan")
+
+    if submitted:
+        errors = validate_prefs(country, city, start_date, end_date)
+        if errors:
+            st.error("\n\n".join(errors))
         else:
             # Save preferences to session state
             st.session_state.travel_preferences = {
@@ -373,7 +446,7 @@ elif st.session_state.page == 1:
                 'end_date': end_date,
                 'num_travelers': num_travelers,
                 'budget': budget,
-                'budget_level': budget_options[budget],
+                'budget_level': BUDGET_OPTIONS[budget],
                 'travel_style': travel_style,
                 'accommodation_type': accommodation_type,
                 'must_see_attractions': must_see_attractions,
@@ -404,23 +477,26 @@ elif st.session_state.page == 2:
     </div>
     """, unsafe_allow_html=True)
     
-    if 'travel_plan' not in st.session_state or not st.session_state.travel_plan:
+    # Reuse the plan while the inputs it was built from are unchanged; edited preferences produce a new one
+    # (identical requests from other sessions are served by GenAI's on-disk plan cache)
+    plan_key = (
+        mbti, preferences['city'], preferences['country'], preferences['duration'],
+        preferences['num_travelers'], preferences['budget'], tuple(sorted(preferences['travel_style'])),
+        preferences['accommodation_type'], preferences.get('must_see_attractions', ''),
+        preferences.get('food_preferences', '')
+    )
+    if not st.session_state.travel_plan or st.session_state.travel_plan_key != plan_key:
         with st.spinner("Creating your personalized travel plan based on your MBTI personality type..."):
             # 모든 여행 선호사항을 전달
-            travel_plan = genai.create_detailed_travel_plan(
-                mbti_type=mbti,
-                city=preferences['city'],
-                country=preferences['country'],
-                duration=preferences['duration'],
-                num_travelers=preferences['num_travelers'],
-                budget=preferences['budget'],
-                travel_style=preferences['travel_style'],
-                accommodation_type=preferences['accommodation_type'],
-                must_see_attractions=preferences.get('must_see_attractions', ''),
-                food_preferences=preferences.get('food_preferences', ''),
-                start_date=preferences.get('start_date')
+            # Show the plan as it streams in, then replace it with the formatted version below
+            from utils import stream_travel_plan
+            placeholder = st.empty()
+            buf = placeholder.write_stream(stream_travel_plan(preferences, mbti, genai))
+            placeholder.empty()
+            st.session_state.travel_plan = genai.format_travel_plan(
+                mbti, preferences['city'], preferences['country'], preferences['duration'], buf
             )
-            st.session_state.travel_plan = travel_plan
+            st.session_state.travel_plan_key = plan_key
     
     # Display the travel plan
     st.markdown(f"""
@@ -527,112 +603,3 @@ elif st.session_state.page == 3:
             # In a real app, this would convert to DOCX format
             if st.button("Download as Word Document"):
                 st.info("Word document download would be available here in a real application.")
-
-# Custom Genai Class Extension (to be added to genai.py)
-class GenAI:
-    def create_detailed_travel_plan(
-        self, 
-        mbti_type: str,
-        city: str, 
-        country: str, 
-        duration: int,
-        num_travelers: int,
-        budget: str,
-        travel_style: List[str],
-        accommodation_type: str,
-        must_see_attractions: str = '',
-        food_preferences: str = '',
-        start_date: datetime = None
-    ):
-        """
-        Generate a comprehensive travel plan with detailed considerations
-        
-        Args:
-            mbti_type (str): Traveler's MBTI personality type
-            city (str): Destination city
-            country (str): Destination country
-            duration (int): Trip duration in days
-            num_travelers (int): Number of people traveling
-            budget (str): Budget range (Budget/Moderate/Luxury/Ultra-Luxury)
-            travel_style (List[str]): Preferred travel styles
-            accommodation_type (str): Preferred accommodation type
-            must_see_attractions (str, optional): Specific attractions to include
-            food_preferences (str, optional): Dietary restrictions or preferences
-            start_date (datetime, optional): Planned start date of the trip
-        
-        Returns:
-            Dict: Comprehensive travel plan with details
-        """
-        # 여행 계획 생성을 위한 상세 프롬프트 구성
-        detailed_prompt = f"""
-        Create a comprehensive travel plan for a {mbti_type} traveler visiting {city}, {country}.
-
-        Trip Details:
-        - Duration: {duration} days
-        - Number of Travelers: {num_travelers}
-        - Budget: {budget}
-        - Travel Styles: {', '.join(travel_style)}
-        - Accommodation Preference: {accommodation_type}
-
-        Additional Considerations:
-        - Must-See Attractions: {must_see_attractions or 'None specified'}
-        - Food Preferences: {food_preferences or 'None specified'}
-
-        Plan Requirements:
-        1. Detailed daily itinerary with:
-           - Morning activities
-           - Lunch recommendations
-           - Afternoon exploration
-           - Dinner suggestions
-           - Evening entertainment
-           - For each activity, Provide an official website link or Google Maps link
-        2. Transportation options between activities
-           - Public transit routes
-           - Estimated travel times
-           - Alternative transportation methods
-        3. Estimated costs for:
-           - Accommodation per night
-           - Meals (breakfast, lunch, dinner)
-           - Transportation
-           - Activities and attractions
-           - Total daily and trip expenses
-        4. Accommodation recommendations matching preferences
-        5. Restaurant suggestions considering food preferences
-        6. Hidden gems and local experiences unique to {mbti_type} travelers
-        7. Budget breakdown with percentage allocation
-
-        Customization Notes:
-        - Tailor the plan to match the {mbti_type} personality type's travel preferences
-        - Balance structured activities with flexible exploration time
-        - Include mix of popular attractions and off-the-beaten-path experiences
-        - Provide practical tips and cultural insights
-        - Consider traveler's potential interests based on MBTI type
-
-        Output Format:
-        - Clear, engaging, and easy-to-read layout
-        - Use markdown or HTML for formatting
-        - Include section headers for easy navigation
-        - Provide estimated timings for each activity
-        """
-
-        # AI를 통한 여행 계획 생성
-        raw_plan = self.generate_text(detailed_prompt, max_tokens=4000)
-
-        # 여행 계획을 HTML과 Markdown 형식으로 포맷팅
-        plan_html = f"""
-        <div class="travel-plan">
-            <h1>{city}, {country} Travel Plan for {mbti_type} Traveler</h1>
-            <div class="plan-details">
-                {raw_plan.replace('\n', '<br>')}
-            </div>
-        </div>
-        """
-
-        return {
-            'mbti_type': mbti_type,
-            'destination': f"{city}, {country}",
-            'title': f"{mbti_type} Travel Experience in {city}",
-            'plan_html': plan_html,
-            'plan_markdown': raw_plan
-        }
-
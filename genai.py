@@ -1,69 +1,675 @@
-import os
+import asyncio
 import openai
+import httpx
 import json
-import pandas as pd
-import time
+import orjson
 import re
-import markdown
-from typing import List, Dict, Optional, Union
+import hashlib
+import shelve
+import threading
+import functools
+import diskcache
+from genai_parallel import RateLimitedRequester
+from genai_batch import submit_batch, wait_for_batch, collect_batch, missing_results, batch_analyze_mbti
+from typing import List, Optional
 from datetime import datetime
 
+FALLBACK_TEXT = "Sorry, I couldn't generate a response at the moment."
+PLAN_CACHE_TTL = 7 * 24 * 60 * 60
+
+BUNDLE_INSTRUCTIONS = "You are a travel inspiration writer. Return only valid JSON."
+BUNDLE_PROMPT = """
+Return JSON with keys 'mbti_description' and 'motivational_paragraph' for MBTI={mbti}.
+- mbti_description: Describe the {mbti} personality type in 1-2 sentences, focusing on travel preferences.
+- motivational_paragraph: A short motivational paragraph (maximum 3 sentences) explaining why creating a travel plan based on MBTI personality type is important and enhances travel experiences.
+"""
+BUNDLE_KEYS = ('mbti_description', 'motivational_paragraph')
+# Pull a key's string value out of a truncated or malformed JSON reply
+BUNDLE_KEY_PATTERNS = {key: re.compile(rf'"{key}"\s*:\s*"((?:[^"\\]|\\.)*)') for key in BUNDLE_KEYS}
+
+
+def _is_complete_bundle(response):
+    # Only a reply that parses and fills both keys is worth keeping in the persistent cache
+    try:
+        bundle = orjson.loads(response)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(bundle, dict) and all(isinstance(bundle.get(key), str) and bundle[key] for key in BUNDLE_KEYS)
+
+
+MBTI_INSTRUCTIONS = "You are an AI psychologist specializing in personality analysis. Return only valid JSON."
+MAX_TWEET_CHARS = 200
+MBTI_TYPES = [e + n + t + j for e in "EI" for n in "NS" for t in "TF" for j in "JP"]
+MBTI_PROMPT = """
+Based on the following tweets, analyze the likely MBTI (Myers-Briggs Type Indicator) personality type.
+Tweets:
+{tweets}
+Return JSON:
+{{
+    "mbti_type": "XXXX",
+    "scores": {{
+        "E": 0-100,
+        "I": 0-100,
+        "N": 0-100,
+        "S": 0-100,
+        "F": 0-100,
+        "T": 0-100,
+        "J": 0-100,
+        "P": 0-100
+    }},
+    "explanation": "Brief explanation"
+}}
+"""
+
+RECOMMENDATION_SECTIONS = ('tourist_attractions', 'recommended_neighborhoods', 'restaurants', 'hidden_experiences')
+RECOMMENDATIONS_PROMPT = """
+Based on the following preferences and MBTI type, create a high-level travel plan:
+MBTI Type: {mbti_type}
+Preferences:
+- Country: {country}
+- City: {city}
+- Travel Style: {travel_style}
+- Food Preferences: {food_preferences}
+- Must-See Attractions: {must_see_attractions}
+Create JSON output with:
+{sections}
+"""
+
+DAILY_ITINERARY_INSTRUCTIONS = "You are a travel itinerary planner. Only output valid JSON."
+DAILY_ITINERARY_PROMPT = """
+Create a detailed Day {day_number} itinerary for {date}:
+Selected options:
+{selected_options}
+City: {city}
+{mbti_line}Travel Style: {travel_style}
+Structure:
+- Morning: 2-3 activities
+- Afternoon: 2-3 activities
+- Evening: 1-2 activities
+- Creative day theme
+- End with a fun motivational note
+Output JSON: theme, morning, afternoon, evening, notes
+"""
+MULTI_DAY_ITINERARY_PROMPT = """
+Create a detailed itinerary for each of these {num_days} days, in order:
+{days}
+Selected options:
+{selected_options}
+City: {city}
+{mbti_line}Travel Style: {travel_style}
+Structure for each day:
+- Morning: 2-3 activities
+- Afternoon: 2-3 activities
+- Evening: 1-2 activities
+- Creative day theme, different for every day
+- End with a fun motivational note
+Output JSON: {{"days": [...]}} with one object per day, each with theme, morning, afternoon, evening, notes
+"""
+
+# Structured output schemas; strict mode needs every property required and no extra properties
+MBTI_SCHEMA = {
+    "name": "mbti_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "mbti_type": {"type": "string", "enum": MBTI_TYPES},
+            "scores": {
+                "type": "object",
+                "properties": {letter: {"type": "integer"} for letter in "EINSFTJP"},
+                "required": list("EINSFTJP"),
+                "additionalProperties": False
+            },
+            "explanation": {"type": "string"}
+        },
+        "required": ["mbti_type", "scores", "explanation"],
+        "additionalProperties": False
+    }
+}
+
+_ACTIVITIES = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"time": {"type": "string"}, "description": {"type": "string"}},
+        "required": ["time", "description"],
+        "additionalProperties": False
+    }
+}
+_DAY = {
+    "type": "object",
+    "properties": {
+        "theme": {"type": "string"},
+        "morning": _ACTIVITIES,
+        "afternoon": _ACTIVITIES,
+        "evening": _ACTIVITIES,
+        "notes": {"type": "string"}
+    },
+    "required": ["theme", "morning", "afternoon", "evening", "notes"],
+    "additionalProperties": False
+}
+DAILY_ITINERARY_SCHEMA = {"name": "daily_itinerary", "strict": True, "schema": _DAY}
+MULTI_DAY_ITINERARY_SCHEMA = {
+    "name": "multi_day_itinerary",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"days": {"type": "array", "items": _DAY}},
+        "required": ["days"],
+        "additionalProperties": False
+    }
+}
+
+# Static part of every detailed plan request, sent as the system message. At this length the request
+# stays under the 1024-token minimum for provider prompt caching, so keeping it short is the saving.
+DETAILED_PLAN_INSTRUCTIONS = """
+You are an expert travel planner writing personalized, detailed itineraries with actionable, specific recommendations.
+Cover, in markdown sections:
+- Itinerary: activities matched to the traveler's MBTI traits, mixing structured and spontaneous experiences
+- Each day: morning, lunch, afternoon, dinner, evening entertainment
+- Transportation: transit options, travel times, cost estimates
+- Accommodation: options of the preferred type, nightly cost, proximity to key attractions
+- Budget: daily expenses by lodging, food, activities and transport, plus ways to save
+- The must-see attractions and food preferences/restrictions from the trip specifics
+- Unique experiences: local hidden gems, cultural insights, MBTI-tailored experiences
+Be engaging, include estimated timings and costs, and give practical travel tips.
+"""
+DETAILED_PLAN_PROMPT = """
+Create a comprehensive {duration}-day travel plan for an {mbti_type} traveler visiting {city}, {country}.
+
+Trip Specifics:
+- Number of Travelers: {num_travelers}
+- Budget Level: {budget}
+- Travel Styles: {travel_style}
+- Accommodation Preference: {accommodation_type}
+- Must-See Attractions: {must_see_attractions}
+- Food Preferences/Restrictions: {food_preferences}
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def _markdown_parser():
+    # Imported on first render to keep it out of process start-up;
+    # markdown-it-py renders the plans several times faster than Python-Markdown
+    from markdown_it import MarkdownIt
+    return MarkdownIt("commonmark")
+
+
+def _render_markdown(text):
+    return _markdown_parser().render(text)
+
+
+def _recommendations_schema(sections):
+    # One list of named places or experiences per requested section
+    places = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {"name": {"type": "string"}, "description": {"type": "string"}},
+            "required": ["name", "description"],
+            "additionalProperties": False
+        }
+    }
+    return {
+        "name": "travel_recommendations",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {section: places for section in sections},
+            "required": list(sections),
+            "additionalProperties": False
+        }
+    }
+
+
+class SemanticCache:
+    """
+    Persistent cache for generated text, keyed by prompt embeddings.
+
+    Entries live in namespaces (one per combination of instructions, output format,
+    model and temperature), and a prompt is only ever matched against entries of its
+    own namespace: exactly, or when the cosine similarity of their embeddings reaches
+    ``threshold``. Entries are stored with ``shelve`` so they are shared across
+    sessions and restarts. numpy is only imported where vectors are handled, so
+    exact-match use never loads it.
+    """
+
+    def __init__(self, client, path='.semantic_cache', threshold=0.92, model='text-embedding-3-small'):
+        self.client = client
+        self.path = path
+        self.threshold = threshold
+        self.model = model
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._responses = {}
+        self._responses_by_row = {}
+        self._vectors = {}
+
+    def _load(self):
+        # Read the shelf once, on first use; entries written before namespacing are skipped
+        with shelve.open(self.path) as db:
+            entries = dict(db)
+        for key, entry in entries.items():
+            if len(entry) == 3:
+                namespace, vector, response = entry
+                self._add(namespace, key.split(":", 1)[1], vector, response)
+        self._loaded = True
+
+    def _add(self, namespace, prompt, vector, response):
+        self._responses[(namespace, prompt)] = response
+        if vector is None:
+            return
+        import numpy as np
+        row = vector[np.newaxis, :]
+        vectors = self._vectors.get(namespace)
+        self._vectors[namespace] = row if vectors is None else np.vstack([vectors, row])
+        self._responses_by_row.setdefault(namespace, []).append(response)
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts):
+        # One embeddings request for all texts
+        import numpy as np
+        data = self.client.embeddings.create(model=self.model, input=list(texts)).data
+        vectors = np.asarray([item.embedding for item in data], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def get(self, prompt, namespace='', exact_only=False):
+        """
+        Look up a cached response for the prompt within a namespace.
+
+        Returns
+        -------
+        tuple
+            (response, vector) - the cached response or None, and the prompt
+            embedding when one was computed so callers can reuse it in ``put``.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if (namespace, prompt) in self._responses:
+                return self._responses[(namespace, prompt)], None
+            vectors = self._vectors.get(namespace)
+            if exact_only or vectors is None:
+                return None, None
+            responses = self._responses_by_row[namespace]
+
+        try:
+            vector = self.embed(prompt)
+        except Exception as e:
+            print(f"Error embedding prompt: {str(e)}")
+            return None, None
+
+        similarities = vectors @ vector
+        best = int(similarities.argmax())
+        if similarities[best] >= self.threshold:
+            return responses[best], vector
+        return None, vector
+
+    def put(self, prompt, response, vector=None, namespace='', embed=True):
+        # Without embed the entry is only found by exact matches, and no embeddings request is made
+        if vector is None and embed:
+            try:
+                vector = self.embed(prompt)
+            except Exception as e:
+                # Still worth keeping for exact matches
+                print(f"Error embedding prompt: {str(e)}")
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._add(namespace, prompt, vector, response)
+            with shelve.open(self.path) as db:
+                db[f"{namespace}:{prompt}"] = (namespace, vector, response)
+
+
 class GenAI:
-    def __init__(self, openai_api_key):
+    def __init__(self, openai_api_key, default_model='gpt-4o', json_model='gpt-4o-mini'):
+        """
+        Parameters:
+        ----------
+        openai_api_key : str
+            OpenAI API key.
+        default_model : str
+            Model used when a call does not name one, including the markdown travel plans.
+        json_model : str
+            Faster model for fixed-schema JSON tasks (MBTI analysis and daily itineraries).
+        """
         self.client = openai.Client(api_key=openai_api_key)
+        # One pooled connection set for the lifetime of this instance; the default pool
+        # caps out well below the concurrency the rate limiter allows
+        self.aclient = openai.AsyncOpenAI(
+            api_key=openai_api_key,
+            # RateLimitedRequester does the retrying, with the rate limiter in between attempts
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=256, max_keepalive_connections=256),
+                timeout=httpx.Timeout(60, connect=10)
+            )
+        )
+        self.requester = RateLimitedRequester(self.aclient)
         self.openai_api_key = openai_api_key
+        self.default_model = default_model
+        self.json_model = json_model
+        self.semantic_cache = SemanticCache(self.client)
+        self.plan_cache = diskcache.Cache('./plan_cache')
+        self.response_cache = diskcache.Cache('./.genai_cache')
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def run(self, coro):
+        """
+        Runs a coroutine to completion from synchronous code and returns its result.
+
+        The async client's connection pool is bound to the event loop it first runs on,
+        so every coroutine goes through one long-lived loop in a background thread
+        instead of a fresh asyncio.run() loop per call.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def agenerate_text(self, prompt, instructions='You are a helpful AI travel assistant', model=None, output_type='text', temperature=1, schema=None):
+        """
+        Async counterpart of generate_text, so independent requests can run concurrently.
+        Requests share one rate limiter, so concurrent calls back off instead of hitting the limits.
+        """
+        response = await self.requester.request(self._chat_request(prompt, instructions, model, output_type, temperature, schema))
+        return FALLBACK_TEXT if response is None else response
+
+    def generate_texts_batch(self, prompts, instructions_list=None, model=None, output_type='text', temperature=1, schema=None):
+        """
+        Generates responses for several prompts concurrently within the API rate limits.
+
+        Parameters:
+        ----------
+        prompts : list
+            User prompts to send.
+        instructions_list : list, optional
+            System instructions for each prompt; defaults to the travel assistant instructions.
+        schema : dict, optional
+            JSON schema for structured outputs, applied to every prompt.
+
+        Returns:
+        -------
+        list
+            Responses in the order of prompts, with FALLBACK_TEXT for failed requests.
+        """
+        if instructions_list is None:
+            instructions_list = ['You are a helpful AI travel assistant'] * len(prompts)
+        requests = [
+            self._chat_request(prompt, instructions, model, output_type, temperature, schema)
+            for prompt, instructions in zip(prompts, instructions_list)
+        ]
+        responses = self.run(self.requester.run(requests))
+        return [FALLBACK_TEXT if response is None else response for response in responses]
+
+    def _chat_request(self, prompt, instructions, model, output_type, temperature, schema=None):
+        # A JSON schema switches on structured outputs, so the reply always parses and conforms
+        if schema is not None:
+            response_format = {"type": "json_schema", "json_schema": schema}
+        else:
+            response_format = {"type": output_type}
+        return dict(
+            model=model or self.default_model,
+            temperature=temperature,
+            response_format=response_format,
+            messages=[
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": prompt}
+            ]
+        )
+
+    def generate_text(self, prompt, instructions='You are a helpful AI travel assistant', model=None, output_type='text', temperature=1, semantic_cache=False, cache=False, schema=None, semantic_exact_only=False, is_cacheable=None):
+        # Deterministic requests (or ones the caller opts in) are served from disk on repeat
+        request = self._chat_request(prompt, instructions, model, output_type, temperature, schema)
+        cache_key = None
+        if cache or temperature == 0:
+            cache_key = hashlib.blake2b(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+            cached = self.response_cache.get(cache_key)
+            if cached is not None and (is_cacheable is None or is_cacheable(cached)):
+                return cached
+
+        vector = None
+        if semantic_cache:
+            namespace = self._semantic_namespace(request)
+            cached, vector = self.semantic_cache.get(prompt, namespace, exact_only=semantic_exact_only)
+            if cached is not None and (is_cacheable is None or is_cacheable(cached)):
+                return cached
+
+        try:
+            completion = self.client.chat.completions.create(**request)
+            response = completion.choices[0].message.content
+        except Exception as e:
+            print(f"Error generating text: {str(e)}")
+            return FALLBACK_TEXT
 
-    def generate_text(self, prompt, instructions='You are a helpful AI travel assistant', model="gpt-4o", output_type='text', temperature=1):
+        # is_cacheable keeps replies the caller could not use (e.g. malformed JSON) out of the caches
+        if is_cacheable is not None and not is_cacheable(response):
+            return response
+        if semantic_cache:
+            self.semantic_cache.put(prompt, response, vector, namespace, embed=not semantic_exact_only)
+        if cache_key is not None:
+            self.response_cache.set(cache_key, response)
+        return response
+
+    def generate_text_stream(self, prompt, instructions='You are a helpful AI travel assistant', model=None, temperature=1):
+        """
+        Like generate_text, but yields the response in chunks as they arrive.
+        A failed request ends the stream with FALLBACK_TEXT.
+        """
+        model = model or self.default_model
+        received = False
         try:
-            completion = self.client.chat.completions.create(
+            stream = self.client.chat.completions.create(
                 model=model,
                 temperature=temperature,
-                response_format={"type": output_type},
+                stream=True,
                 messages=[
                     {"role": "system", "content": instructions},
                     {"role": "user", "content": prompt}
                 ]
             )
-            response = completion.choices[0].message.content
-            return response
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    received = True
+                    yield chunk.choices[0].delta.content
         except Exception as e:
             print(f"Error generating text: {str(e)}")
-            return "Sorry, I couldn't generate a response at the moment."
+            # Always end a failed stream with the fallback text so callers can tell it is incomplete
+            yield f"\n\n{FALLBACK_TEXT}" if received else FALLBACK_TEXT
 
-    def analyze_mbti(self, tweets_df):
+    async def agenerate_text_stream(self, prompt, instructions='You are a helpful AI travel assistant', model=None, temperature=1):
+        """
+        Async counterpart of generate_text_stream, drawing on the same rate limits as agenerate_text.
+        """
+        request = self._chat_request(prompt, instructions, model, 'text', temperature)
+        received = False
         try:
-            sample_tweets = tweets_df.sample(min(50, len(tweets_df)))
-            tweets_text = "\n---\n".join(sample_tweets['text'].tolist())
-            
-            prompt = f"""
-            Based on the following tweets, analyze the likely MBTI (Myers-Briggs Type Indicator) personality type.
-            Tweets:
-            {tweets_text}
-            Return JSON:
-            {{
-                "mbti_type": "XXXX",
-                "scores": {{
-                    "E": 0-100,
-                    "I": 0-100,
-                    "N": 0-100,
-                    "S": 0-100,
-                    "F": 0-100,
-                    "T": 0-100,
-                    "J": 0-100,
-                    "P": 0-100
-                }},
-                "explanation": "Brief explanation"
-            }}
-            """
+            await self.requester.acquire(self.requester.estimate_tokens(request))
+            stream = await self.aclient.chat.completions.create(stream=True, **request)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    received = True
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            print(f"Error generating text: {str(e)}")
+            yield f"\n\n{FALLBACK_TEXT}" if received else FALLBACK_TEXT
+
+    def warm_semantic_cache(self, prompts, instructions='You are a helpful AI travel assistant', model=None, output_type='text', temperature=1, is_cacheable=None, embed=True):
+        """
+        Generates and caches responses for prompts that are not cached yet.
+
+        Only exact matches count as cached here, and the missing prompts are generated
+        concurrently through the rate limiter. Responses failing is_cacheable are neither
+        stored nor counted. Pass embed=False when the prompts are only ever looked up
+        by exact match, to skip the embeddings request. Returns how many of the prompts
+        are cached afterwards, so callers can tell a partial or failed warm-up.
+        """
+        is_cacheable = is_cacheable or (lambda response: response is not None)
+        requests = [self._chat_request(prompt, instructions, model, output_type, temperature) for prompt in prompts]
+        namespace = self._semantic_namespace(requests[0]) if requests else ''
+        pending = []
+        for prompt, request in zip(prompts, requests):
+            cached = self.semantic_cache.get(prompt, namespace, exact_only=True)[0]
+            if cached is None or not is_cacheable(cached):
+                pending.append((prompt, request))
+        if not pending:
+            return len(prompts)
+
+        responses = self.run(self.requester.run([request for _, request in pending]))
+        generated = [
+            (prompt, response) for (prompt, _), response in zip(pending, responses)
+            if response is not None and is_cacheable(response)
+        ]
+        vectors = [None] * len(generated)
+        if generated and embed:
+            try:
+                vectors = self.semantic_cache.embed_many([prompt for prompt, _ in generated])
+            except Exception as e:
+                # Still worth keeping for exact matches
+                print(f"Error embedding prompts: {str(e)}")
+        for (prompt, response), vector in zip(generated, vectors):
+            self.semantic_cache.put(prompt, response, vector, namespace, embed=False)
+        return len(prompts) - len(pending) + len(generated)
 
+    def _semantic_namespace(self, request):
+        # Everything about a request except the user prompt: instructions, format, model, temperature
+        settings = {key: value for key, value in request.items() if key != 'messages'}
+        settings['instructions'] = request['messages'][0]['content']
+        return hashlib.blake2b(json.dumps(settings, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+    def generate_bundle(self, mbti_type, semantic_cache=False):
+        """
+        Generates the MBTI description and the motivational paragraph in a single request.
+
+        Parameters:
+        ----------
+        mbti_type : str
+            MBTI personality type to describe.
+        semantic_cache : bool
+            Whether to serve and store the response through the semantic cache.
+
+        Returns:
+        -------
+        dict
+            Dictionary with 'mbti_description' and 'motivational_paragraph' texts.
+        """
+        response = self.generate_text(
+            BUNDLE_PROMPT.format(mbti=mbti_type),
+            instructions=BUNDLE_INSTRUCTIONS,
+            output_type="json_object",
+            temperature=0.7,
+            semantic_cache=semantic_cache,
+            # Prompts for different MBTI types differ by a few letters, so only exact matches are safe
+            semantic_exact_only=True,
+            is_cacheable=_is_complete_bundle
+        )
+
+        try:
+            bundle = orjson.loads(response)
+        except ValueError:
+            # Recover whichever fields came through from a truncated or malformed reply
+            bundle = {}
+            for key in BUNDLE_KEYS:
+                match = BUNDLE_KEY_PATTERNS[key].search(response)
+                if match:
+                    bundle[key] = match.group(1).replace('\\"', '"')
+
+        return {key: bundle.get(key) or FALLBACK_TEXT for key in BUNDLE_KEYS}
+
+    def warm_bundles(self, mbti_types):
+        """
+        Pre-generates the bundle for each MBTI type into the semantic cache.
+        Returns how many of the types have a cached bundle afterwards.
+        """
+        return self.warm_semantic_cache(
+            [BUNDLE_PROMPT.format(mbti=mbti_type) for mbti_type in mbti_types],
+            instructions=BUNDLE_INSTRUCTIONS,
+            output_type="json_object",
+            temperature=0.7,
+            is_cacheable=_is_complete_bundle,
+            # generate_bundle only looks bundles up by exact match
+            embed=False
+        )
+
+    def analyze_mbti(self, tweets_df, use_batch=False, poll_interval=30, model=None):
+        """
+        Infers the MBTI type and scores from a user's tweets.
+
+        With use_batch, tweets_df is a list of DataFrames (one per user) analyzed through
+        the Batch API at half the cost; this blocks until the batch finishes, so it is
+        only meant for offline bulk runs, and returns a list of (mbti_type, scores), with
+        None for users whose request failed or got no result instead of the default type.
+        """
+        if use_batch:
+            batch_id = batch_analyze_mbti(self, tweets_df, model=model)
+            wait_for_batch(self.client, batch_id, poll_interval)
+            results = dict(collect_batch(self.client, batch_id))
+            missing_results(results, range(len(tweets_df)))
+            return [
+                self._parse_mbti(results[str(i)]) if results.get(str(i)) is not None else None
+                for i in range(len(tweets_df))
+            ]
+
+        try:
             response = self.generate_text(
-                prompt,
-                instructions="You are an AI psychologist specializing in personality analysis. Return only valid JSON.",
-                output_type="json_object"
+                self._mbti_prompt(tweets_df),
+                instructions=MBTI_INSTRUCTIONS,
+                model=model or self.json_model,
+                schema=MBTI_SCHEMA
             )
+        except Exception as e:
+            response = None
+            print(f"Error analyzing MBTI: {str(e)}")
+        return self._parse_mbti(response)
+
+    def submit_batch(self, prompts, instructions='You are a helpful AI travel assistant', model=None, output_type='text', temperature=1, poll_interval=30):
+        """
+        Runs prompts through the Batch API and waits for the results.
+
+        Parameters:
+        ----------
+        prompts : list
+            User prompts to send.
+        instructions : str
+            System instructions shared by all prompts.
+
+        Returns:
+        -------
+        list
+            Responses in the order of prompts, with FALLBACK_TEXT for failed requests.
+        """
+        requests = [self._chat_request(prompt, instructions, model, output_type, temperature) for prompt in prompts]
+        batch_id = submit_batch(self.client, requests, list(range(len(prompts))))
+        wait_for_batch(self.client, batch_id, poll_interval)
+        results = dict(collect_batch(self.client, batch_id))
+        missing_results(results, range(len(prompts)))
+        return [results.get(str(i)) or FALLBACK_TEXT for i in range(len(prompts))]
+
+    def _mbti_request(self, tweets_df, model=None):
+        return self._chat_request(self._mbti_prompt(tweets_df), MBTI_INSTRUCTIONS, model or self.json_model, "json_object", 1, MBTI_SCHEMA)
+
+    def _mbti_prompt(self, tweets_df):
+        import numpy as np
+        # Sample the text column directly instead of building a sub-DataFrame
+        texts = tweets_df['text']
+        sample_tweets = texts.iloc[np.random.choice(len(texts), min(50, len(texts)), replace=False)]
+        # Cap each tweet's length and drop repeats (retweets, copy-paste) to bound the prompt size
+        sample_tweets = sample_tweets.str.slice(0, MAX_TWEET_CHARS).drop_duplicates()
+        # str.cat joins inside pandas without an intermediate list of strings
+        return MBTI_PROMPT.format(tweets=sample_tweets.str.cat(sep="\n---\n"))
 
+    def _parse_mbti(self, response):
+        try:
+            # No response means the failure was already logged where it happened
+            if response is None:
+                return "ENFP", {"E": 60, "I": 40, "N": 70, "S": 30, "F": 65, "T": 35, "J": 45, "P": 55}
             if isinstance(response, str):
-                response = json.loads(response)
+                response = orjson.loads(response)
 
             mbti_type = response.get("mbti_type", "ENFP")
             scores = response.get("scores", {
@@ -88,7 +694,8 @@ class GenAI:
         accommodation_type: str,
         must_see_attractions: Optional[str] = '',
         food_preferences: Optional[str] = '',
-        start_date: Optional[datetime] = None
+        start_date: Optional[datetime] = None,
+        model: Optional[str] = None
     ):
         """
         Create a comprehensive travel plan with detailed considerations
@@ -117,6 +724,8 @@ class GenAI:
             Dietary restrictions or preferences, by default ''
         start_date : Optional[datetime], optional
             Planned start date of the trip, by default None
+        model : Optional[str], optional
+            Model to generate the plan with, by default the instance's default_model
 
         Returns:
         -------
@@ -124,86 +733,33 @@ class GenAI:
             Comprehensive travel plan with details
         """
         try:
-            # Construct a detailed prompt incorporating all parameters
-            prompt = f"""
-            Create a comprehensive {duration}-day travel plan for an {mbti_type} traveler visiting {city}, {country}.
-
-            Trip Specifics:
-            - Number of Travelers: {num_travelers}
-            - Budget Level: {budget}
-            - Travel Styles: {', '.join(travel_style)}
-            - Accommodation Preference: {accommodation_type}
-
-            Detailed Requirements:
-            1. Personalized Itinerary for {mbti_type}
-               - Align activities with {mbti_type} personality traits
-               - Balance structured and spontaneous experiences
-
-            2. Daily Breakdown
-               - Morning activities
-               - Lunch and dining recommendations
-               - Afternoon explorations
-               - Dinner suggestions
-               - Evening entertainment
-
-            3. Transportation
-               - Recommended transit options
-               - Estimated travel times
-               - Transportation budget estimates
-
-            4. Accommodation
-               - {accommodation_type} recommendations
-               - Estimated nightly costs
-               - Proximity to key attractions
-
-            5. Budget Considerations
-               - Estimated daily expenses
-               - Breakdown by category (lodging, food, activities, transport)
-               - Options for budget optimization
-
-            6. Additional Considerations
-               - Must-See Attractions: {must_see_attractions or 'None specified'}
-               - Food Preferences/Restrictions: {food_preferences or 'None specified'}
-
-            7. Unique Experiences
-               - Local hidden gems
-               - Cultural insights
-               - Experiences tailored to {mbti_type}
-
-            Output Format:
-            - Markdown with clear sections
-            - Engaging and informative
-            - Include estimated timings and costs
-            - Provide practical travel tips
-            """
+            # Identical trip requests reuse the stored plan instead of regenerating it
+            cache_key = self._plan_cache_key(
+                mbti_type, city, country, duration, num_travelers, budget,
+                travel_style, accommodation_type, must_see_attractions, food_preferences, model
+            )
+            cached_plan = self.plan_cache.get(cache_key)
+            if cached_plan is not None:
+                return cached_plan
 
-            # Use system instructions to further guide the AI
-            instructions = f"""
-            You are an expert travel planner specializing in personalized, detailed itineraries.
-            Focus on creating a comprehensive, engaging plan that considers:
-            - Traveler's personality type
-            - Budget constraints
-            - Personal preferences
-            - Unique local experiences
-            Provide actionable, specific recommendations.
-            """
+            prompt = self._detailed_plan_prompt(
+                mbti_type, city, country, duration, num_travelers, budget,
+                travel_style, accommodation_type, must_see_attractions, food_preferences
+            )
 
             # Generate the travel plan using the AI
             response = self.generate_text(
                 prompt, 
-                instructions=instructions, 
-                model="gpt-4", 
+                instructions=DETAILED_PLAN_INSTRUCTIONS, 
+                model=model, 
                 temperature=0.7
             )
 
             # Prepare the travel plan dictionary
-            travel_plan = {
-                "mbti_type": mbti_type,
-                "destination": f"{city}, {country}",
-                "duration": duration,
-                "plan_markdown": response,
-                "plan_html": markdown.markdown(response)
-            }
+            travel_plan = self.format_travel_plan(mbti_type, city, country, duration, response)
+
+            if response != FALLBACK_TEXT:
+                self.plan_cache.set(cache_key, travel_plan, expire=PLAN_CACHE_TTL)
 
             return travel_plan
 
@@ -229,77 +785,286 @@ class GenAI:
                 "destination": f"{city}, {country}",
                 "duration": duration,
                 "plan_markdown": fallback_plan,
-                "plan_html": markdown.markdown(fallback_plan)
+                "plan_html": _render_markdown(fallback_plan)
             }
 
-    def generate_travel_recommendations(self, preferences, mbti_type):
+    def stream_detailed_travel_plan(
+        self,
+        mbti_type: str,
+        city: str,
+        country: str,
+        duration: int,
+        num_travelers: int,
+        budget: str,
+        travel_style: List[str],
+        accommodation_type: str,
+        must_see_attractions: Optional[str] = '',
+        food_preferences: Optional[str] = '',
+        start_date: Optional[datetime] = None,
+        model: Optional[str] = None
+    ):
+        """
+        Streaming variant of create_detailed_travel_plan, yielding the markdown plan as it is generated.
+
+        Parameters are the same as for create_detailed_travel_plan. Pass the joined chunks
+        to format_travel_plan to build the plan dictionary. A cached plan is yielded in one piece.
+        """
+        cache_key = self._plan_cache_key(
+            mbti_type, city, country, duration, num_travelers, budget,
+            travel_style, accommodation_type, must_see_attractions, food_preferences, model
+        )
+        cached_plan = self.plan_cache.get(cache_key)
+        if cached_plan is not None:
+            yield cached_plan['plan_markdown']
+            return
+
+        prompt = self._detailed_plan_prompt(
+            mbti_type, city, country, duration, num_travelers, budget,
+            travel_style, accommodation_type, must_see_attractions, food_preferences
+        )
+
+        chunks = []
+        for chunk in self.generate_text_stream(prompt, instructions=DETAILED_PLAN_INSTRUCTIONS, model=model, temperature=0.7):
+            chunks.append(chunk)
+            yield chunk
+
+        response = "".join(chunks)
+        if not response.endswith(FALLBACK_TEXT):
+            travel_plan = self.format_travel_plan(mbti_type, city, country, duration, response)
+            self.plan_cache.set(cache_key, travel_plan, expire=PLAN_CACHE_TTL)
+
+    def format_travel_plan(self, mbti_type, city, country, duration, plan_markdown):
+        """
+        Builds the travel plan dictionary from the generated markdown.
+        """
+        return {
+            "mbti_type": mbti_type,
+            "destination": f"{city}, {country}",
+            "duration": duration,
+            "plan_markdown": plan_markdown,
+            "plan_html": _render_markdown(plan_markdown)
+        }
+
+    def _detailed_plan_prompt(self, mbti_type, city, country, duration, num_travelers, budget,
+                              travel_style, accommodation_type, must_see_attractions, food_preferences):
+        # Only the trip specifics vary; everything shared lives in DETAILED_PLAN_INSTRUCTIONS
+        return DETAILED_PLAN_PROMPT.format(
+            duration=duration, mbti_type=mbti_type, city=city, country=country,
+            num_travelers=num_travelers, budget=budget, travel_style=', '.join(travel_style),
+            accommodation_type=accommodation_type,
+            must_see_attractions=must_see_attractions or 'None specified',
+            food_preferences=food_preferences or 'None specified'
+        )
+
+    def _plan_cache_key(self, mbti_type, city, country, duration, num_travelers, budget,
+                        travel_style, accommodation_type, must_see_attractions, food_preferences, model=None):
+        # Everything that reaches the prompt, plus the model that answers it; the start date does not
+        trip = {
+            'model': model or self.default_model,
+            'mbti': mbti_type,
+            'city': city,
+            'country': country,
+            'duration': duration,
+            'travelers': num_travelers,
+            'budget': budget,
+            'styles': sorted(travel_style),
+            'accom': accommodation_type,
+            'must_see': must_see_attractions or '',
+            'food': food_preferences or ''
+        }
+        return hashlib.sha256(json.dumps(trip, sort_keys=True).encode()).hexdigest()
+
+    def generate_travel_recommendations(self, preferences, mbti_type, sections=None, model=None):
+        """
+        Generates the high-level travel plan as JSON.
+
+        With sections, each section is requested separately and the requests run in
+        parallel; the smaller completions return sooner than one combined response.
+        """
+        instructions = "You are a professional travel advisor. Output only JSON."
         try:
-            prompt = f"""
-            Based on the following preferences and MBTI type, create a high-level travel plan:
-            MBTI Type: {mbti_type}
-            Preferences:
-            - Country: {preferences.get('country', '')}
-            - City: {preferences.get('city', '')}
-            - Travel Style: {', '.join(preferences.get('travel_style', []))}
-            - Food Preferences: {preferences.get('food_preferences', '')}
-            - Must-See Attractions: {preferences.get('must_see_attractions', '')}
-            Create JSON output with:
-            - tourist_attractions
-            - recommended_neighborhoods
-            - restaurants
-            - hidden_experiences
-            """
+            if not sections:
+                prompt = self._recommendations_prompt(preferences, mbti_type, RECOMMENDATION_SECTIONS)
+                response = self.generate_text(prompt, instructions=instructions, schema=_recommendations_schema(RECOMMENDATION_SECTIONS), model=model, temperature=0.7)
 
-            instructions = "You are a professional travel advisor. Output only JSON."
+                if isinstance(response, str):
+                    response = orjson.loads(response)
 
-            response = self.generate_text(prompt, instructions=instructions, output_type="json_object", model="gpt-4", temperature=0.7)
+                return response
 
-            if isinstance(response, str):
-                response = json.loads(response)
+            prompts = [self._recommendations_prompt(preferences, mbti_type, [section]) for section in sections]
+            responses = self.run(self.requester.run([
+                self._chat_request(prompt, instructions, model, "json_object", 0.7, _recommendations_schema([section]))
+                for prompt, section in zip(prompts, sections)
+            ]))
 
-            return response
+            travel_plan = {}
+            for section, response in zip(sections, responses):
+                try:
+                    travel_plan.update(orjson.loads(response))
+                except (TypeError, orjson.JSONDecodeError):
+                    # A failed request comes back as None
+                    print(f"Error generating travel recommendations for {section}")
+            return travel_plan
 
         except Exception as e:
             print(f"Error generating travel recommendations: {str(e)}")
             return {}
 
-    def generate_daily_itinerary(self, day_number, date, preferences, selected_options):
-        try:
-            selected_summary = "\n".join([f"- {opt['type']}: {opt['selected']}" for opt in selected_options])
-
-            prompt = f"""
-            Create a detailed Day {day_number} itinerary for {date.strftime('%A, %B %d')}:
-            Selected options:
-            {selected_summary}
-            City: {preferences.get('city', '')}
-            Travel Style: {', '.join(preferences.get('travel_style', []))}
-            Structure:
-            - Morning: 2-3 activities
-            - Afternoon: 2-3 activities
-            - Evening: 1-2 activities
-            - Creative day theme
-            - End with a fun motivational note
-            Output JSON: theme, morning, afternoon, evening, notes
-            """
+    def _recommendations_prompt(self, preferences, mbti_type, sections):
+        return RECOMMENDATIONS_PROMPT.format(
+            mbti_type=mbti_type,
+            country=preferences.get('country', ''),
+            city=preferences.get('city', ''),
+            travel_style=', '.join(preferences.get('travel_style', [])),
+            food_preferences=preferences.get('food_preferences', ''),
+            must_see_attractions=preferences.get('must_see_attractions', ''),
+            sections="\n".join(f"- {section}" for section in sections)
+        )
 
-            instructions = "You are a travel itinerary planner. Only output valid JSON."
+    def generate_daily_itinerary(self, day_number, date, preferences, selected_options, model=None):
+        try:
+            prompt = self._daily_itinerary_prompt(day_number, date, preferences, selected_options)
 
-            response = self.generate_text(prompt, instructions=instructions, output_type="json_object", model="gpt-4", temperature=0.7)
+            response = self.generate_text(prompt, instructions=DAILY_ITINERARY_INSTRUCTIONS, schema=DAILY_ITINERARY_SCHEMA, model=model or self.json_model, temperature=0.7)
 
             if isinstance(response, str):
-                response = json.loads(response)
+                response = orjson.loads(response)
 
             return response
 
         except Exception as e:
             print(f"Error generating daily itinerary: {str(e)}")
-            return {
-                "theme": "Exploration Day",
-                "morning": [],
-                "afternoon": [],
-                "evening": [],
-                "notes": "Enjoy your day!"
-            }
+            return self._fallback_itinerary()
+
+    async def agenerate_daily_itinerary(self, day_number, date, preferences, selected_options, mbti_type=None, model=None):
+        request = self._daily_itinerary_request(day_number, date, preferences, selected_options, mbti_type, model)
+        return self._parse_itinerary(await self.requester.request(request))
+
+    def _daily_itinerary_request(self, day_number, date, preferences, selected_options, mbti_type=None, model=None):
+        prompt = self._daily_itinerary_prompt(day_number, date, preferences, selected_options, mbti_type)
+        return self._chat_request(prompt, DAILY_ITINERARY_INSTRUCTIONS, model or self.json_model, 'text', 0.7, DAILY_ITINERARY_SCHEMA)
+
+    def _parse_itinerary(self, response):
+        # No response means the failure was already logged where it happened
+        if response is None:
+            return self._fallback_itinerary()
+        try:
+            return orjson.loads(response)
+        except Exception as e:
+            print(f"Error generating daily itinerary: {str(e)}")
+            return self._fallback_itinerary()
+
+    async def generate_full_trip(self, preferences, mbti_type, days, selected_options=(), model=None):
+        """
+        Generates the itineraries for several days concurrently.
+
+        Parameters:
+        ----------
+        preferences : dict
+            User travel preferences.
+        mbti_type : str
+            Traveler's MBTI personality type.
+        days : list
+            (day_number, date) pairs to plan.
+        selected_options : list
+            Options the user selected, as dicts with 'type' and 'selected' keys.
+        model : str, optional
+            Model to plan with; defaults to the instance's json_model.
+
+        Returns:
+        -------
+        list
+            One itinerary dict per entry in days, in the same order.
+        """
+        # Through run() so the requester's max_in_flight cap applies to long trips too
+        responses = await self.requester.run([
+            self._daily_itinerary_request(day_number, date, preferences, selected_options, mbti_type, model)
+            for day_number, date in days
+        ])
+        return [self._parse_itinerary(response) for response in responses]
+
+    def generate_multi_day_itinerary(self, days, preferences, selected_options, mbti_type=None, model=None):
+        """
+        Generates the itineraries for several days in a single request.
+
+        Parameters:
+        ----------
+        days : list
+            (day_number, date) pairs to plan.
+        preferences : dict
+            User travel preferences.
+        selected_options : list
+            Options the user selected, as dicts with 'type' and 'selected' keys.
+        mbti_type : str, optional
+            Traveler's MBTI personality type.
+        model : str, optional
+            Model to plan with; defaults to the instance's json_model.
+
+        Returns:
+        -------
+        list
+            One itinerary dict per entry in days, in the same order.
+        """
+        try:
+            prompt = self._multi_day_itinerary_prompt(days, preferences, selected_options, mbti_type)
+
+            response = self.generate_text(prompt, instructions=DAILY_ITINERARY_INSTRUCTIONS, schema=MULTI_DAY_ITINERARY_SCHEMA, model=model or self.json_model, temperature=0.7)
+
+            daily_plans = orjson.loads(response).get("days", [])
+
+        except Exception as e:
+            print(f"Error generating multi-day itinerary: {str(e)}")
+            daily_plans = []
+
+        # Days the model dropped or malformed fall back individually
+        return [
+            daily_plans[i] if i < len(daily_plans) and isinstance(daily_plans[i], dict) else self._fallback_itinerary()
+            for i in range(len(days))
+        ]
+
+    def generate_text_variants(self, prompt, n, instructions='You are a helpful AI travel assistant', model=None, output_type='text', temperature=1):
+        """
+        Generates n alternative responses to one prompt in a single request.
+        The prompt tokens are billed once, so this is cheaper than n separate calls.
+        """
+        try:
+            completion = self.client.chat.completions.create(n=n, **self._chat_request(prompt, instructions, model, output_type, temperature))
+            return [choice.message.content for choice in completion.choices]
+        except Exception as e:
+            print(f"Error generating text: {str(e)}")
+            return [FALLBACK_TEXT] * n
+
+    def _multi_day_itinerary_prompt(self, days, preferences, selected_options, mbti_type=None):
+        return MULTI_DAY_ITINERARY_PROMPT.format(
+            num_days=len(days),
+            days="\n".join(f"- Day {day_number}: {date.strftime('%A, %B %d')}" for day_number, date in days),
+            **self._itinerary_fields(preferences, selected_options, mbti_type)
+        )
+
+    def _daily_itinerary_prompt(self, day_number, date, preferences, selected_options, mbti_type=None):
+        return DAILY_ITINERARY_PROMPT.format(
+            day_number=day_number,
+            date=date.strftime('%A, %B %d'),
+            **self._itinerary_fields(preferences, selected_options, mbti_type)
+        )
+
+    def _itinerary_fields(self, preferences, selected_options, mbti_type):
+        return dict(
+            selected_options="\n".join(f"- {opt['type']}: {opt['selected']}" for opt in selected_options),
+            city=preferences.get('city', ''),
+            mbti_line=f"MBTI Type: {mbti_type}\n" if mbti_type else "",
+            travel_style=', '.join(preferences.get('travel_style', []))
+        )
+
+    def _fallback_itinerary(self):
+        return {
+            "theme": "Exploration Day",
+            "morning": [],
+            "afternoon": [],
+            "evening": [],
+            "notes": "Enjoy your day!"
+        }
         
     def generate_image(self, prompt, size="1024x1024", quality="standard", n=1):
         """
@@ -0,0 +1,132 @@
+"""
+Offline bulk jobs through the OpenAI Batch API.
+
+Batch requests are billed at half price and draw on a separate, much larger rate
+limit, in exchange for results arriving within a 24 hour window instead of
+immediately. Use this for non-interactive work such as analyzing many Twitter
+users at once; the app itself keeps using the regular endpoints.
+"""
+import orjson
+import time
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def submit_batch(client, requests, custom_ids):
+    """
+    Uploads chat completion requests as a JSONL file and starts a batch job.
+
+    Parameters:
+    ----------
+    client : openai.Client
+        Client used for the upload and the batch job.
+    requests : list
+        Chat completion request bodies, one dict per request.
+    custom_ids : list
+        Unique id per request, used to match results back to requests.
+
+    Returns:
+    -------
+    str
+        ID of the created batch.
+    """
+    lines = [
+        orjson.dumps({"custom_id": str(custom_id), "method": "POST", "url": BATCH_ENDPOINT, "body": body})
+        for custom_id, body in zip(custom_ids, requests)
+    ]
+    batch_file = client.files.create(
+        file=("batch.jsonl", b"\n".join(lines)),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def wait_for_batch(client, batch_id, poll_interval=30):
+    """
+    Polls a batch until it reaches a terminal status and returns it.
+    """
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def collect_batch(client, batch_id):
+    """
+    Downloads the results of a finished batch.
+
+    Successful requests are read from the output file and failed ones from the error
+    file. A batch that expired or was cancelled still yields the requests it got to.
+
+    Yields:
+    ------
+    tuple
+        (custom_id, response content), with None as content for failed requests.
+
+    Raises:
+    ------
+    RuntimeError
+        If the batch has not finished or failed as a whole.
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status not in BATCH_TERMINAL_STATUSES or batch.status == 'failed':
+        raise RuntimeError(f"Batch {batch_id} has status {batch.status}: {batch.errors}")
+    if batch.status != 'completed':
+        print(f"Batch {batch_id} ended with status {batch.status}; collecting partial results")
+
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                print(f"Batch request {result['custom_id']} failed: {result.get('error') or response.get('body')}")
+                yield result["custom_id"], None
+                continue
+            yield result["custom_id"], response["body"]["choices"][0]["message"]["content"]
+
+
+def missing_results(results, custom_ids):
+    """
+    Logs and returns the custom ids that got no line in either result file.
+    """
+    missing = [str(custom_id) for custom_id in custom_ids if str(custom_id) not in results]
+    if missing:
+        print(f"No batch result for {len(missing)} request(s): {', '.join(missing)}")
+    return missing
+
+
+def batch_analyze_mbti(genai, df_list, user_ids=None, model=None):
+    """
+    Submits one MBTI analysis request per user's tweets as a single batch.
+
+    Parameters:
+    ----------
+    genai : GenAI
+        Instance of the GenAI class whose client and prompts are used.
+    df_list : list
+        DataFrames containing each user's tweets.
+    user_ids : list, optional
+        ID per user; defaults to the position in df_list.
+    model : str, optional
+        Model to analyze with; defaults to the GenAI instance's json_model.
+
+    Returns:
+    -------
+    str
+        ID of the created batch; pass it to collect_batch to read the results.
+    """
+    if user_ids is None:
+        user_ids = range(len(df_list))
+    requests = [genai._mbti_request(tweets_df, model) for tweets_df in df_list]
+    return submit_batch(genai.client, requests, list(user_ids))
@@ -0,0 +1,126 @@
+"""
+Rate-limited parallel requests to the OpenAI chat completions API.
+
+Follows the OpenAI cookbook's api_request_parallel_processor: worker coroutines
+pull requests from a queue, wait until the requests and tokens sent over the
+last minute leave room under the account's limits, and retry with exponential
+backoff when the API still reports a rate limit.
+"""
+import asyncio
+import time
+from collections import deque
+
+import openai
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError
+)
+
+
+class RateLimitedRequester:
+    def __init__(self, client, rpm=500, tpm=30000, max_attempts=5, max_in_flight=50, expected_completion_tokens=1000):
+        """
+        Parameters:
+        ----------
+        client : openai.AsyncOpenAI
+            Async client used to send the requests.
+        rpm : int
+            Requests per minute allowed for the account.
+        tpm : int
+            Tokens per minute allowed for the account.
+        max_attempts : int
+            Attempts per request before giving up on it.
+        max_in_flight : int
+            Maximum number of requests awaiting a response at once.
+        expected_completion_tokens : int
+            Completion size assumed when budgeting tokens for a request.
+        """
+        self.client = client
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_attempts = max_attempts
+        self.max_in_flight = max_in_flight
+        self.expected_completion_tokens = expected_completion_tokens
+        self._sent = deque()  # (timestamp, tokens) of requests sent in the last minute
+        self._sent_tokens = 0
+        self._lock = asyncio.Lock()
+
+    def estimate_tokens(self, request):
+        # Roughly four characters per token, plus room for the completion
+        chars = sum(len(message['content']) for message in request['messages'])
+        return chars // 4 + self.expected_completion_tokens
+
+    async def acquire(self, tokens):
+        """
+        Waits until a request of the given token estimate fits within the rate limits.
+        """
+        # Capacity no request could ever get would otherwise block forever
+        tokens = min(tokens, self.tpm)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0][0] >= 60:
+                    self._sent_tokens -= self._sent.popleft()[1]
+
+                if len(self._sent) < self.rpm and self._sent_tokens + tokens <= self.tpm:
+                    self._sent.append((now, tokens))
+                    self._sent_tokens += tokens
+                    return
+
+                # Wait until the oldest request leaves the one-minute window
+                await asyncio.sleep(60 - (now - self._sent[0][0]))
+
+    async def request(self, request):
+        """
+        Sends one chat completion request within the rate limits.
+
+        Returns:
+        -------
+        str or None
+            Content of the first choice, or None if every attempt failed.
+        """
+        tokens = self.estimate_tokens(request)
+        for attempt in range(self.max_attempts):
+            await self.acquire(tokens)
+            try:
+                completion = await self.client.chat.completions.create(**request)
+                return completion.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                print(f"Request failed (attempt {attempt + 1}/{self.max_attempts}): {str(e)}")
+                # No point backing off after the last attempt
+                if attempt < self.max_attempts - 1:
+                    await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                print(f"Request failed: {str(e)}")
+                return None
+        return None
+
+    async def run(self, requests):
+        """
+        Sends all requests with up to max_in_flight of them outstanding at once.
+
+        Parameters:
+        ----------
+        requests : list
+            Keyword arguments for chat.completions.create, one dict per request.
+
+        Returns:
+        -------
+        list
+            Response contents (or None for failed requests), in the order of requests.
+        """
+        results = [None] * len(requests)
+        queue = asyncio.Queue()
+        for index, request in enumerate(requests):
+            queue.put_nowait((index, request))
+
+        async def worker():
+            while not queue.empty():
+                index, request = queue.get_nowait()
+                results[index] = await self.request(request)
+
+        await asyncio.gather(*[worker() for _ in range(min(self.max_in_flight, len(requests)))])
+        return results
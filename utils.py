@@ -1,11 +1,19 @@
-import pandas as pd
 import numpy as np
 import re
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import requests
-from bs4 import BeautifulSoup
-import random
+import asyncio
+import functools
+
+# plotly, bs4, requests and httpx are imported inside the functions that use them,
+# so importing utils stays cheap on pages that only need part of it
+
+_WS = re.compile(r'\s*\n\s*|\s{2,}')
+_RADAR_TRACES = (
+    ('polar', ('E', 'N', 'I', 'S'), ['Extraversion (E)', 'Intuition (N)', 'Introversion (I)', 'Sensing (S)'], 'Mind & Energy', '#4361ee'),
+    ('polar2', ('T', 'J', 'F', 'P'), ['Thinking (T)', 'Judging (J)', 'Feeling (F)', 'Perceiving (P)'], 'Nature & Tactics', '#f72585')
+)
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
 
 def analyze_twitter_data(df, genai):
     """
@@ -41,6 +49,30 @@ def generate_mbti_radar_chart(mbti_scores):
     plotly.graph_objects.Figure
         Radar chart figure.
     """
+    import plotly.graph_objects as go
+
+    # Start from a copy of the cached two-chart layout so the template is never modified
+    fig = go.Figure(_radar_chart_base())
+    
+    # First radar chart: E/I and N/S; second radar chart: T/F and J/P
+    for subplot, order, theta, name, color in _RADAR_TRACES:
+        fig.add_trace(
+            go.Scatterpolar(
+                r=[mbti_scores[k] for k in order],
+                theta=theta,
+                fill='toself',
+                name=name,
+                line=dict(color=color),
+                subplot=subplot
+            )
+        )
+    
+    return fig
+
+@functools.lru_cache(maxsize=1)
+def _radar_chart_base():
+    from plotly.subplots import make_subplots
+
     # Create two radar charts: one for E/I vs N/S and one for T/F vs J/P
     fig = make_subplots(
         rows=1, cols=2,
@@ -49,30 +81,6 @@ def generate_mbti_radar_chart(mbti_scores):
                         "Thinking/Feeling & Judging/Perceiving")
     )
     
-    # First radar chart: E/I and N/S
-    fig.add_trace(
-        go.Scatterpolar(
-            r=[mbti_scores['E'], mbti_scores['N'], mbti_scores['I'], mbti_scores['S']],
-            theta=['Extraversion (E)', 'Intuition (N)', 'Introversion (I)', 'Sensing (S)'],
-            fill='toself',
-            name='Mind & Energy',
-            line=dict(color='#4361ee')
-        ),
-        row=1, col=1
-    )
-    
-    # Second radar chart: T/F and J/P
-    fig.add_trace(
-        go.Scatterpolar(
-            r=[mbti_scores['T'], mbti_scores['J'], mbti_scores['F'], mbti_scores['P']],
-            theta=['Thinking (T)', 'Judging (J)', 'Feeling (F)', 'Perceiving (P)'],
-            fill='toself',
-            name='Nature & Tactics',
-            line=dict(color='#f72585')
-        ),
-        row=1, col=2
-    )
-    
     # Update layout
     fig.update_layout(
         polar=dict(
@@ -96,7 +104,7 @@ def generate_mbti_radar_chart(mbti_scores):
     
     return fig
 
-def create_travel_plan(preferences, mbti, genai):
+def create_travel_plan(preferences, mbti, genai, sections=None):
     """
     Creates a comprehensive travel plan based on user preferences and MBTI.
     
@@ -108,6 +116,8 @@ def create_travel_plan(preferences, mbti, genai):
         MBTI personality type.
     genai : GenAI
         Instance of the GenAI class for text generation.
+    sections : list, optional
+        Plan sections to generate as parallel requests; one combined request if omitted.
         
     Returns:
     -------
@@ -115,9 +125,41 @@ def create_travel_plan(preferences, mbti, genai):
         Dictionary containing the complete travel plan.
     """
     # Generate travel recommendations
-    travel_plan = genai.generate_travel_recommendations(preferences, mbti)
+    travel_plan = genai.generate_travel_recommendations(preferences, mbti, sections=sections)
     return travel_plan
 
+def stream_travel_plan(preferences, mbti, genai):
+    """
+    Streams the detailed markdown travel plan for the given preferences and MBTI.
+    
+    Parameters:
+    ----------
+    preferences : dict
+        Dictionary containing user travel preferences.
+    mbti : str
+        MBTI personality type.
+    genai : GenAI
+        Instance of the GenAI class for text generation.
+        
+    Yields:
+    ------
+    str
+        Chunks of the markdown plan as they are generated, e.g. for st.write_stream.
+    """
+    yield from genai.stream_detailed_travel_plan(
+        mbti_type=mbti,
+        city=preferences['city'],
+        country=preferences['country'],
+        duration=preferences['duration'],
+        num_travelers=preferences['num_travelers'],
+        budget=preferences['budget'],
+        travel_style=preferences['travel_style'],
+        accommodation_type=preferences['accommodation_type'],
+        must_see_attractions=preferences.get('must_see_attractions', ''),
+        food_preferences=preferences.get('food_preferences', ''),
+        start_date=preferences.get('start_date')
+    )
+
 def extract_text_from_url(url):
     """
     Extracts the main text content from a URL.
@@ -133,35 +175,108 @@ def extract_text_from_url(url):
         Extracted text content.
     """
     try:
-        # Request the webpage
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
+        # Request the webpage over the shared session, reusing its open connections
+        response = _session().get(url, timeout=10)
         response.raise_for_status()
         
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
+        return _extract_text(response.text)
         
-        # Extract text
-        text = soup.get_text()
+    except Exception as e:
+        print(f"Error extracting text from URL: {str(e)}")
+        return f"Failed to extract content from {url}. Please enter a topic directly."
+
+@functools.lru_cache(maxsize=1)
+def _session():
+    # One session per process so repeated fetches skip the TCP/TLS handshake;
+    # transient failures are retried with backoff
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    session = requests.Session()
+    session.headers.update(_HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+async def aextract_text_from_url(client, url):
+    """
+    Async counterpart of extract_text_from_url, fetching with a shared httpx.AsyncClient.
+    
+    Parameters:
+    ----------
+    client : httpx.AsyncClient
+        Client whose connection pool is reused across requests.
+    url : str
+        URL to extract content from.
         
-        # Clean up text
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+    Returns:
+    -------
+    str
+        Extracted text content.
+    """
+    try:
+        response = await client.get(url, timeout=10)
+        response.raise_for_status()
         
-        # Return a summary (first 500 characters)
-        return text[:500] + "..." if len(text) > 500 else text
+        return _extract_text(response.text)
         
     except Exception as e:
         print(f"Error extracting text from URL: {str(e)}")
         return f"Failed to extract content from {url}. Please enter a topic directly."
 
+def extract_texts_from_urls(urls):
+    """
+    Extracts the main text content from several URLs, fetching them concurrently.
+    
+    Parameters:
+    ----------
+    urls : list
+        URLs to extract content from.
+        
+    Returns:
+    -------
+    list
+        Extracted text content, in the order of urls.
+    """
+    import httpx
+
+    async def fetch_all():
+        # The client is bound to this event loop, so it lives for the duration of the call
+        async with httpx.AsyncClient(
+            http2=True,
+            headers=_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=50)
+        ) as client:
+            return await asyncio.gather(*[aextract_text_from_url(client, url) for url in urls])
+    
+    return asyncio.run(fetch_all())
+
+def _extract_text(html):
+    from bs4 import BeautifulSoup
+
+    # Parse the HTML content (lxml is a C parser, much faster than html.parser)
+    soup = BeautifulSoup(html, 'lxml')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+    
+    # Extract text
+    text = soup.get_text()
+    
+    # Clean up text: collapse line breaks and runs of spaces into single line breaks
+    text = _WS.sub('\n', text.strip())
+    
+    # Return a summary (first 500 characters)
+    return text[:500] + "..." if len(text) > 500 else text
+
 def generate_daily_itinerary(day_number, date, preferences, travel_plan, choice_history, genai):
     """
     Generates a detailed daily itinerary based on preferences and choices.
@@ -197,22 +312,58 @@ def generate_daily_itinerary(day_number, date, preferences, travel_plan, choice_
     # Generate daily itinerary
     daily_plan = genai.generate_daily_itinerary(day_number, date, preferences, selected_options)
     
+    return _assign_coordinates(daily_plan)
+
+def generate_trip_itineraries(days, preferences, travel_plan, choice_history, genai, mbti=None):
+    """
+    Generates the daily itineraries for several days of a trip at once.
+    All days are planned in a single request, so the trip costs one round-trip instead of one per day.
+    
+    Parameters:
+    ----------
+    days : list
+        (day_number, date) pairs to generate itineraries for.
+    preferences : dict
+        User travel preferences.
+    travel_plan : dict
+        The complete travel plan.
+    choice_history : list
+        List of user choice history.
+    genai : GenAI
+        Instance of the GenAI class for text generation.
+    mbti : str, optional
+        MBTI personality type used to tailor each day.
+        
+    Returns:
+    -------
+    list
+        List of daily itinerary dictionaries, one per entry in days.
+    """
+    selected_options = [{'type': choice['type'], 'selected': choice['selected']} for choice in choice_history]
+    
+    daily_plans = genai.generate_multi_day_itinerary(days, preferences, selected_options, mbti)
+    
+    return [_assign_coordinates(daily_plan) for daily_plan in daily_plans]
+
+def _assign_coordinates(daily_plan):
     # Assign random coordinates for map visualization (in a real app, these would be real coordinates)
     # This is just for demonstration purposes
     base_lat = 40.7128  # Example: NYC latitude
     base_lon = -74.0060  # Example: NYC longitude
     
-    for time_of_day in ['morning', 'afternoon', 'evening']:
-        for i, activity in enumerate(daily_plan[time_of_day]):
+    # Draw random coordinates near the base point for every activity in one call
+    times_of_day = ['morning', 'afternoon', 'evening']
+    n_total = sum(len(daily_plan[time_of_day]) for time_of_day in times_of_day)
+    coords = iter(np.random.uniform(-0.025, 0.025, size=(n_total, 2)) + [base_lat, base_lon])
+    
+    for time_of_day in times_of_day:
+        for activity in daily_plan[time_of_day]:
+            random_lat, random_lon = next(coords)
             if 'location' not in activity or 'lat' not in activity['location']:
-                # Generate random coordinates near the base point
-                random_lat = base_lat + (random.random() - 0.5) * 0.05
-                random_lon = base_lon + (random.random() - 0.5) * 0.05
-                
                 activity['location'] = {
                     'name': activity['description'].split(':')[0] if ':' in activity['description'] else activity['description'],
-                    'lat': random_lat,
-                    'lon': random_lon
+                    'lat': float(random_lat),
+                    'lon': float(random_lon)
                 }
     
     return daily_plan
@@ -415,7 +566,8 @@ def get_transportation_options(city, country):
 def optimize_route(locations):
     """
     Optimizes a route between multiple locations.
-    This is a placeholder function - in a real app, this would use a routing algorithm.
+    Builds a nearest-neighbor route from the first location and refines it with 2-opt;
+    the route is open (it does not return to the start).
     
     Parameters:
     ----------
@@ -427,6 +579,38 @@ def optimize_route(locations):
     list
         Optimized list of locations in visit order.
     """
-    # In a real app, this would implement a traveling salesman problem solution
-    # For this demo, we'll just return the original order
-    return locations
\ No newline at end of file
+    n = len(locations)
+    if n < 3:
+        return list(locations)
+    
+    # Pairwise distances on a local flat projection (longitude degrees shrink with latitude)
+    coords = np.array([[loc['lat'], loc['lon']] for loc in locations], dtype=float)
+    coords[:, 1] *= np.cos(np.radians(coords[:, 0].mean()))
+    dist = np.linalg.norm(coords[:, None] - coords[None, :], axis=-1)
+    
+    # Nearest-neighbor route starting from the first location
+    route = [0]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[0] = False
+    for _ in range(n - 1):
+        candidates = np.where(unvisited, dist[route[-1]], np.inf)
+        nxt = int(candidates.argmin())
+        route.append(nxt)
+        unvisited[nxt] = False
+    
+    # 2-opt: reverse segments while that shortens the route; the start stays fixed
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 2):
+            for j in range(i + 2, n):
+                a, b, c = route[i], route[i + 1], route[j]
+                # The last stop has no outgoing edge on an open route
+                d = route[j + 1] if j + 1 < n else None
+                before = dist[a, b] + (dist[c, d] if d is not None else 0)
+                after = dist[a, c] + (dist[b, d] if d is not None else 0)
+                if after < before - 1e-12:
+                    route[i + 1:j + 1] = route[i + 1:j + 1][::-1]
+                    improved = True
+    
+    return [locations[i] for i in route]